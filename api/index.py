@@ -1,10 +1,25 @@
 import os
+import re
+import json
+import time
+import heapq
 import shutil
+import hashlib
+import atexit
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import socket
+from urllib.parse import urlsplit
+from threading import Lock, local, Thread
+import orjson
+from cachetools import TTLCache
 import requests
-from http.cookiejar import MozillaCookieJar
-from flask import Flask, request, send_file, jsonify
+from quart import Quart, request, send_from_directory
+import youtube_search
 from youtube_search import YoutubeSearch
 import yt_dlp
+from yt_dlp.cookies import YoutubeDLCookieJar
 
 # -------------------------
 # Constants for cookie paths
@@ -13,69 +28,214 @@ COOKIE_SRC = os.path.join(os.getcwd(), 'cookies.txt')
 COOKIE_TMP = '/tmp/cookies.txt'
 
 # -------------------------
-# Copy cookies.txt into /tmp (writable) on cold start
+# Copy cookies.txt into /tmp (writable) on cold start. Skipped when the
+# copy is already current so a worker restart neither rewrites the file
+# nor truncates it under a yt-dlp instance that may be mid-read.
 # -------------------------
-if os.path.exists(COOKIE_SRC):
+def _ensure_cookie():
+    try:
+        # Warm container: a non-empty, current copy is already staged,
+        # so skip even the source stat and return immediately
+        if (os.path.getsize(COOKIE_TMP) > 0
+                and os.path.getmtime(COOKIE_TMP) >= os.path.getmtime(COOKIE_SRC)):
+            return
+    except OSError:
+        pass  # missing or unreadable target; fall through to the copy
     try:
         shutil.copy(COOKIE_SRC, COOKIE_TMP)
-    except PermissionError:
-        pass  # already copied in this container
+    except (FileNotFoundError, PermissionError):
+        pass  # no source cookies, or already copied in this container
+
+_ensure_cookie()
 
 # -------------------------
-# Patch requests.get to use the cookie jar
+# Shared cookie-aware session with a real connection pool, reusing
+# keep-alive sockets to youtube.com instead of paying a TCP+TLS
+# handshake per call. Instead of monkey-patching the global
+# requests.get - which silently rerouted every requests consumer in the
+# process - the session is injected only into youtube_search, the one
+# dependency that needs it; yt-dlp shares the jar directly.
 # -------------------------
+# The jar is parsed from disk exactly once and shared with both the
+# session and every yt-dlp instance; CookieJar locks internally, so
+# cross-thread sharing is safe. It must be yt-dlp's own jar class (a
+# MozillaCookieJar subclass, so Session accepts it unchanged): the
+# extractors call get_cookie_header()/get_cookies_for_url(), which the
+# stdlib jar doesn't have
+jar = YoutubeDLCookieJar(COOKIE_TMP)
 if os.path.exists(COOKIE_TMP):
-    jar = MozillaCookieJar(COOKIE_TMP)
     jar.load(ignore_discard=True, ignore_expires=True)
-    session = requests.Session()
-    session.cookies = jar
-    original_get = requests.get
+session = requests.Session()
+session.cookies = jar
+_adapter = requests.adapters.HTTPAdapter(
+    pool_connections=32, pool_maxsize=32, max_retries=3)
+session.mount('https://', _adapter)
+session.mount('http://', _adapter)
+youtube_search.requests = session  # Session.get matches requests.get
 
-    def get_with_cookies(url, **kwargs):
-        kwargs.setdefault('cookies', session.cookies)
-        return original_get(url, **kwargs)
-
-    requests.get = get_with_cookies
+# -------------------------
+# Quart App Initialization (async so concurrent requests overlap
+# their yt-dlp network waits instead of serializing per worker)
+# -------------------------
+app = Quart(__name__)
+
+def _j(data, status=200, max_age=0):
+    # orjson serializes large yt-dlp info dicts an order of magnitude
+    # faster than the default pure-Python encoder behind jsonify;
+    # default=str covers the odd non-JSON value in raw info dicts.
+    # max_age > 0 additionally emits Cache-Control and an ETag so edge
+    # caches and browsers can serve repeat hits without touching Python.
+    body = orjson.dumps(data, default=str)
+    if status == 200 and max_age:
+        etag = hashlib.md5(body).hexdigest()
+        if request.headers.get('If-None-Match') == etag:
+            return app.response_class(b'', status=304,
+                                      headers={'ETag': etag})
+        return app.response_class(
+            body, status=status, mimetype='application/json',
+            headers={'Cache-Control': f'public, max-age={max_age}',
+                     'ETag': etag})
+    return app.response_class(body, status=status,
+                              mimetype='application/json')
 
 # -------------------------
-# Flask App Initialization
+# Response cache: Redis survives cold starts and is shared across
+# workers, so a cache hit skips the 1-5 s yt-dlp extraction entirely.
+# Disabled transparently when REDIS_URL is unset or redis is missing.
+# These helpers do blocking I/O: async handlers must call them through
+# _run so a slow cache backend can't stall the event loop.
 # -------------------------
-app = Flask(__name__)
+CACHE_TTL = 5 * 3600
+
+try:
+    import redis
+    # Short socket timeouts: a hung Redis must degrade to a cache miss,
+    # not stall the caller (and, transitively, the event loop) forever
+    _redis = (redis.Redis.from_url(os.environ['REDIS_URL'],
+                                   socket_connect_timeout=1,
+                                   socket_timeout=1)
+              if os.environ.get('REDIS_URL') else None)
+except ImportError:
+    _redis = None
+
+# Zero-dependency fallback when Redis is absent: one file per key under
+# /tmp, which persists for the container lifetime and is shared across
+# workers - unlike a per-process dict, warm invocations keep their hits
+FCACHE_DIR = '/tmp/fcache'
+# Entry cap so /tmp can't fill up over a long-lived container; expired
+# entries are also unlinked on read, this sweep handles live ones
+_FCACHE_MAX = 512
+_fcache_sets = 0
+
+def _fcache_path(key):
+    return os.path.join(FCACHE_DIR, hashlib.md5(key.encode()).hexdigest())
+
+def _fcache_mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0  # raced with an unlink; sorts as oldest
+
+def _fcache_prune():
+    # Drop the oldest entries until the cap holds; concurrent deletions
+    # of the same file are harmless
+    try:
+        names = os.listdir(FCACHE_DIR)
+    except OSError:
+        return
+    if len(names) <= _FCACHE_MAX:
+        return
+    paths = sorted((os.path.join(FCACHE_DIR, n) for n in names),
+                   key=_fcache_mtime)
+    for path in paths[:len(paths) - _FCACHE_MAX]:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+def cache_get(key):
+    if _redis is not None:
+        try:
+            raw = _redis.get(key)
+        except redis.RedisError:
+            return None
+        return json.loads(raw) if raw is not None else None
+    path = _fcache_path(key)
+    try:
+        with open(path) as fh:
+            expires, value = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if expires > time.time():
+        return value
+    try:
+        os.unlink(path)  # expired: reclaim the slot instead of leaking it
+    except OSError:
+        pass
+    return None
+
+def cache_set(key, value, ttl=CACHE_TTL):
+    if _redis is not None:
+        try:
+            # default=str keeps raw yt-dlp info dicts serializable
+            _redis.setex(key, ttl, json.dumps(value, default=str))
+        except redis.RedisError:
+            pass
+        return
+    global _fcache_sets
+    try:
+        os.makedirs(FCACHE_DIR, exist_ok=True)
+        path = _fcache_path(key)
+        with open(path + '.tmp', 'w') as fh:
+            json.dump([time.time() + ttl, value], fh, default=str)
+        os.replace(path + '.tmp', path)  # atomic for concurrent readers
+    except OSError:
+        return
+    # Sweep opportunistically rather than listing the dir on every
+    # write; the counter races are benign for a best-effort prune
+    _fcache_sets += 1
+    if _fcache_sets % 64 == 0:
+        _fcache_prune()
 
 # -------------------------
 # Helper: Convert durations to ISO 8601
 # -------------------------
+_DUR_RE = re.compile(r'^(?:(\d+):)?(?:(\d+):)?(\d+)$')
+
+# Deterministic on its input and called per result; memoizing makes
+# repeated durations (popular videos, playlists) a dict hit
+@functools.lru_cache(maxsize=4096)
 def to_iso_duration(duration_str: str) -> str:
-    parts = duration_str.split(':') if duration_str else []
-    iso = 'PT'
-    if len(parts) == 3:
-        h, m, s = parts
-        if int(h): iso += f"{int(h)}H"
-        iso += f"{int(m)}M{int(s)}S"
-    elif len(parts) == 2:
-        m, s = parts
-        iso += f"{int(m)}M{int(s)}S"
-    elif len(parts) == 1 and parts[0].isdigit():
-        iso += f"{int(parts[0])}S"
-    else:
-        iso += '0S'
-    return iso
+    if not duration_str:
+        return 'PT0S'
+    m = _DUR_RE.match(duration_str)
+    if not m:
+        return 'PT0S'
+    # Left-pad so "MM:SS" fills minutes/seconds rather than hours
+    parts = [int(x) for x in m.groups() if x is not None]
+    h, mi, s = [0] * (3 - len(parts)) + parts
+    out = 'PT'
+    if h:
+        out += f'{h}H'
+    if mi or h:
+        out += f'{mi}M'
+    return out + f'{s}S'
 
 # -------------------------
 # yt-dlp Options
 # -------------------------
-ydl_opts_full = {
+# No 'format' key: these routes only read the info dict, and a format
+# string forces yt-dlp's selector/merger to walk every format for a
+# download that never happens
+ydl_opts_info = {
     'quiet': True,
-    'skip_download': True,
-    'format': 'bestvideo+bestaudio/best',
-    'cookiefile': COOKIE_TMP
+    'skip_download': True
 }
 ydl_opts_meta = {
     'quiet': True,
     'skip_download': True,
     'simulate': True,
-    'noplaylist': True,
-    'cookiefile': COOKIE_TMP
+    'noplaylist': True
 }
 
 ydl_opts_download = {
@@ -85,23 +245,231 @@ ydl_opts_download = {
     'format': 'worstaudio',
     'outtmpl': '/tmp/%(id)s.%(ext)s',
     'noplaylist': True,
-    'cookiefile': COOKIE_TMP,  # if you're using cookies
     'cachedir': '/tmp/yt-dlp-cache'
 }
 
 
+# -------------------------
+# Reusable YoutubeDL instances: construction builds the extractor
+# registry and HTTP handlers, a fixed 50-300 ms cost we shouldn't pay
+# on every request. One instance per profile per executor thread (see
+# _ydl below) keeps reuse without cross-thread state sharing.
+# -------------------------
+# Playlists only need id/title/duration per entry; extract_flat avoids
+# a full per-video extraction for every playlist item
+ydl_opts_playlist = {
+    **ydl_opts_meta,
+    'noplaylist': False,
+    'extract_flat': 'in_playlist'
+}
+
+_YDL_PROFILES = {
+    'info': ydl_opts_info,
+    'meta': ydl_opts_meta,
+    'playlist': ydl_opts_playlist
+}
+_thread_ydl = local()
+# Every instance ever created, so the pools they hold (yt-dlp keeps its
+# HTTP handlers and their urllib3 pools on the instance) live for the
+# whole process and are torn down only at exit - never between requests
+_all_ydl = []
+_all_ydl_lock = Lock()
+
+def _ydl(profile):
+    # One instance per profile per executor thread: reuse keeps the
+    # extractor registry and keep-alive sockets warm between requests,
+    # while thread-locality sidesteps YoutubeDL's mutable internals
+    # without serializing extractions behind a lock
+    instances = getattr(_thread_ydl, 'instances', None)
+    if instances is None:
+        instances = _thread_ydl.instances = {}
+    ydl = instances.get(profile)
+    if ydl is None:
+        ydl = instances[profile] = yt_dlp.YoutubeDL(_YDL_PROFILES[profile])
+        # Share the pre-parsed jar instead of a cookiefile path, so no
+        # instance ever re-reads the Netscape file from disk
+        ydl.cookiejar = jar
+        with _all_ydl_lock:
+            _all_ydl.append(ydl)
+    return ydl
+
+@atexit.register
+def _close_ydl():
+    with _all_ydl_lock:
+        for ydl in _all_ydl:
+            try:
+                ydl.close()
+            except Exception:
+                pass
+        _all_ydl.clear()
 
-def extract_info(url=None, search_query=None, opts=None):
-    opts = opts or ydl_opts_full
-    with yt_dlp.YoutubeDL(opts) as ydl:
+# -------------------------
+# Cold-start warmup: resolve the YouTube hosts and run one throwaway
+# extraction in the background, so the first real request after a
+# serverless cold start doesn't pay for DNS, the first TLS handshake
+# and the extractor's lazy setup
+# -------------------------
+def _warmup():
+    for host in ('www.youtube.com', 'i.ytimg.com'):
+        try:
+            socket.getaddrinfo(host, 443)
+        except OSError:
+            pass
+    try:
+        _ydl('meta').extract_info(
+            'https://www.youtube.com/watch?v=dQw4w9WgXcQ', download=False)
+    except Exception:
+        pass  # warmup is best-effort; real requests proceed regardless
+
+Thread(target=_warmup, daemon=True, name='warmup').start()
+
+def _ydl_for(opts):
+    return _ydl('meta' if opts is ydl_opts_meta else 'info')
+
+# In-process L1 over extract_info: repeated targets are very common in
+# video apps and each miss costs ~700 ms upstream. YouTube stream URLs
+# live ~6 h, so a 5 min TTL is comfortably safe.
+_INFO_CACHE = TTLCache(maxsize=2048, ttl=300)
+_INFO_LOCK = Lock()
+
+def _extract_info_sync(url=None, search_query=None, opts=None, fresh=False):
+    profile = 'meta' if opts is ydl_opts_meta else 'info'
+    key = (('q', search_query.strip().lower(), profile) if search_query
+           else ('url', url, profile))
+    if not fresh:
+        with _INFO_LOCK:
+            hit = _INFO_CACHE.get(key)
+        if hit is not None:
+            return hit, None, None
+    # L2: shared across workers/replicas, so only one process pays the
+    # extraction cost. Full-profile results embed expiring stream URLs
+    # and get a short TTL; meta results are URL-free and keep longer.
+    # fresh skips both cache reads (but still refreshes them below).
+    rkey = f"info:{profile}:{url or search_query.strip().lower()}"
+    if fresh or (info := cache_get(rkey)) is None:
+        ydl = _ydl_for(opts)
         if search_query:
             data = ydl.extract_info(f"ytsearch:{search_query}", download=False)
             entries = data.get('entries') or []
             if not entries:
                 return None, {'error': 'No search results'}, 404
-            return entries[0], None, None
-        info = ydl.extract_info(url, download=False)
-        return info, None, None
+            info = entries[0]
+        else:
+            info = ydl.extract_info(url, download=False)
+        cache_set(rkey, info, ttl=300 if profile == 'info' else 6 * 3600)
+    with _INFO_LOCK:
+        _INFO_CACHE[key] = info
+    return info, None, None
+
+# Dedicated pool for upstream extractor/search work, sized to the
+# concurrency YouTube will tolerate before rate-limiting; the unnamed
+# default executor would happily oversubscribe it
+YDL_POOL = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('YDL_CONCURRENCY', 8)),
+    thread_name_prefix='ydl')
+
+async def _run(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        YDL_POOL, functools.partial(func, *args, **kwargs))
+
+# Single-flight map: identical concurrent extractions share one
+# upstream call instead of stampeding YouTube on a cold cache
+_inflight: dict[str, asyncio.Future] = {}
+_inflight_lock = asyncio.Lock()
+
+async def single_flight(key, coro_factory):
+    async with _inflight_lock:
+        fut = _inflight.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(coro_factory())
+            _inflight[key] = fut
+            fut.add_done_callback(lambda _f: _inflight.pop(key, None))
+    return await fut
+
+async def extract_info(url=None, search_query=None, opts=None, fresh=False):
+    # yt-dlp is synchronous; run it in the pool so the event loop stays
+    # free. fresh=True forces a real extraction past the L1/L2 caches
+    # (under its own single-flight key, so it never piggybacks on a
+    # cache-served call) and rewrites them with the result.
+    profile = 'meta' if opts is ydl_opts_meta else 'info'
+    key = (f"extract:{profile}:{'fresh:' if fresh else ''}"
+           f"{url or (search_query or '').strip().lower()}")
+    return await single_flight(
+        key, lambda: _run(_extract_info_sync, url, search_query, opts, fresh))
+
+# Search scrapes are the main upstream quota cost, and popular titles
+# repeat constantly - cache them for a day under the normalized query
+SEARCH_TTL = 24 * 3600
+
+def cached_search(title, limit=1):
+    key = f"search:{limit}:{title.strip().lower()}"
+    if (hit := cache_get(key)) is not None:
+        return hit
+    results = YoutubeSearch(title, max_results=limit).to_dict()
+    cache_set(key, results, ttl=SEARCH_TTL)
+    return results
+
+def _extract_playlist_sync(target):
+    # Runs in the pool so the thread-local instance is resolved there
+    return _ydl('playlist').extract_info(target, download=False)
+
+def _flat_search(query):
+    # ytsearch1 through the flat profile resolves the top hit in one
+    # request with no HTML scrape, using the shared cookie jar directly
+    key = f"ysearch:{query.strip().lower()}"
+    if (hit := cache_get(key)) is not None:
+        return hit
+    data = _ydl('playlist').extract_info(f"ytsearch1:{query}", download=False)
+    entry = (data.get('entries') or [None])[0]
+    if entry is not None:
+        cache_set(key, entry, ttl=SEARCH_TTL)
+    return entry
+
+def require_search_or_url(view):
+    # Shared validation for the endpoints accepting either parameter;
+    # the view receives the stripped values instead of re-reading args
+    @functools.wraps(view)
+    async def wrapper():
+        q = request.args.get('search', '').strip()
+        u = request.args.get('url', '').strip()
+        if not (q or u):
+            return _j({'error': 'Provide "search" or "url"'}, 400)
+        return await view(q, u)
+    return wrapper
+
+# Recognize plain YouTube video URLs so fast-meta can skip yt-dlp
+VID_RE = re.compile(r'(?:v=|youtu\.be/|/embed/|/shorts/)([\w-]{11})')
+
+def _oembed_meta(video_id):
+    # The oembed endpoint answers in well under 100 ms vs ~700 ms for a
+    # full extraction; it carries no duration, which fast-meta callers
+    # that need it can still get from the extraction fallback
+    link = f"https://www.youtube.com/watch?v={video_id}"
+    r = session.get('https://www.youtube.com/oembed',
+                    params={'url': link, 'format': 'json'}, timeout=10)
+    r.raise_for_status()
+    data = r.json()
+    return {
+        'title': data.get('title'),
+        'link': link,
+        'duration': None,
+        'thumbnail': data.get('thumbnail_url')
+    }
+
+def _search_suggestions(query, limit=5):
+    # YouTube rarely populates 'related' via yt-dlp, so back suggestions
+    # with a cheap HTML search; failures just mean no extra suggestions
+    try:
+        results = cached_search(query, limit=limit)
+    except Exception:
+        return []
+    return [{
+        'id': r.get('id'),
+        'title': r.get('title'),
+        'url': f"https://www.youtube.com/watch?v={r.get('id')}",
+        'thumbnail': r.get('thumbnails', [None])[0]
+    } for r in results]
 
 # -------------------------
 # Format/List Helpers
@@ -109,98 +477,154 @@ def extract_info(url=None, search_query=None, opts=None):
 def get_size_bytes(fmt):
     return fmt.get('filesize') or fmt.get('filesize_approx') or 0
 
+_SIZE_STEPS = ((1e9, 'GB'), (1e6, 'MB'), (1e3, 'KB'))
+
 def format_size(bytes_val):
-    if bytes_val >= 1e9: return f"{bytes_val/1e9:.2f} GB"
-    if bytes_val >= 1e6: return f"{bytes_val/1e6:.2f} MB"
-    if bytes_val >= 1e3: return f"{bytes_val/1e3:.2f} KB"
+    for step, unit in _SIZE_STEPS:
+        if bytes_val >= step:
+            return f"{bytes_val/step:.2f} {unit}"
     return f"{bytes_val} B"
 
-def build_formats_list(info):
-    fmts = []
-    for f in info.get('formats', []):
-        url_f = f.get('url')
+def _res_key(fmt):
+    # yt-dlp already exposes pixel height as an int; comparing it beats
+    # parsing 'resolution' strings, which sort lexicographically
+    return fmt.get('height') or 0
+
+# kind indexed by (has_video << 1) | has_audio; slot 0 is only hit when
+# both codecs are explicitly 'none', and those rows are skipped
+_KINDS = (None, 'audio-only', 'video-only', 'progressive')
+
+# Built rows memoized per video id: a client walking /download,
+# /api/audio and /api/video for the same video otherwise triggers three
+# identical bucket builds over the same (info-cached) dict. Same 5 min
+# TTL as the info cache so rows never outlive the URLs inside them.
+_FORMATS_CACHE = TTLCache(maxsize=1024, ttl=300)
+_FORMATS_LOCK = Lock()
+
+def build_format_buckets(info):
+    vid = info.get('id')
+    if vid is not None:
+        with _FORMATS_LOCK:
+            hit = _FORMATS_CACHE.get(vid)
+        if hit is not None:
+            return hit
+    # Single pass over the format list with f.get bound once per row;
+    # the per-kind views are built directly so the audio/video endpoints
+    # don't need a second filtering pass over the full list
+    fmts, prog, vonly, aonly = [], [], [], []
+    buckets = {'progressive': prog, 'video-only': vonly, 'audio-only': aonly}
+    for f in info.get('formats') or ():
+        g = f.get
+        url_f = g('url')
         if not url_f:
             continue
-        has_v = f.get('vcodec') != 'none'
-        has_a = f.get('acodec') != 'none'
-        kind = (
-            'progressive' if has_v and has_a else
-            'video-only' if has_v else
-            'audio-only' if has_a else
-            None
-        )
-        if not kind:
+        # A missing codec key means unknown, not absent: the generic
+        # extractor often omits both, and those rows are progressive
+        # media URLs. Only an explicit 'none' rules a track out.
+        has_v = g('vcodec') != 'none'
+        has_a = g('acodec') != 'none'
+        idx = (has_v << 1) | has_a
+        if not idx:
             continue
-        size = get_size_bytes(f)
-        fmts.append({
-            'format_id': f.get('format_id'),
-            'ext': f.get('ext'),
+        kind = _KINDS[idx]
+        size = g('filesize') or g('filesize_approx') or 0
+        entry = {
+            'format_id': g('format_id'),
+            'ext': g('ext'),
             'kind': kind,
             'filesize_bytes': size,
             'filesize': format_size(size),
-            'width': f.get('width'),
-            'height': f.get('height'),
-            'fps': f.get('fps'),
-            'abr': f.get('abr'),
-            'asr': f.get('asr'),
+            'width': g('width'),
+            'height': g('height'),
+            'fps': g('fps'),
+            'abr': g('abr'),
+            'asr': g('asr'),
             'url': url_f
-        })
-    return fmts
+        }
+        fmts.append(entry)
+        buckets[kind].append(entry)
+    result = (fmts, prog, vonly, aonly)
+    if vid is not None:
+        with _FORMATS_LOCK:
+            _FORMATS_CACHE[vid] = result
+    return result
+
+def build_formats_list(info):
+    return build_format_buckets(info)[0]
 
 # -------------------------
 # Routes
 # -------------------------
+# Serialized once at import; the health endpoint is hit constantly and
+# the body never changes (a fresh Response per request keeps headers
+# safely unshared)
+_HOME_BODY = orjson.dumps({'message': '✅ YouTube API is alive'})
+
 @app.route('/')
-def home():
-    return jsonify({'message': '✅ YouTube API is alive'})
+async def home():
+    return app.response_class(_HOME_BODY, mimetype='application/json')
 
 @app.route('/api/fast-meta')
-def api_fast_meta():
-    q = request.args.get('search', '').strip()
-    u = request.args.get('url', '').strip()
-    if not (q or u):
-        return jsonify({'error': 'Provide "search" or "url"'}), 400
+@require_search_or_url
+async def api_fast_meta(q, u):
+    # Normalized-lowercase query key maximizes the hit rate for searches
+    key = f"fast_meta:{q.lower() if q else u}"
+    if (cached := await _run(cache_get, key)) is not None:
+        return _j(cached, max_age=3600)
     try:
         if q:
-            results = YoutubeSearch(q, max_results=1).to_dict()
-            if not results:
-                return jsonify({'error': 'No results'}), 404
-            vid = results[0]
-            return jsonify({
-                'title': vid['title'],
-                'link': f"https://www.youtube.com/watch?v={vid['url_suffix'].split('v=')[-1]}",
-                'duration': to_iso_duration(vid.get('duration', '')),
-                'thumbnail': vid.get('thumbnails', [None])[0]
-            })
+            entry = await single_flight(
+                f"flat_search:{q.lower()}", lambda: _run(_flat_search, q))
+            if not entry:
+                return _j({'error': 'No results'}, 404)
+            thumbs = entry.get('thumbnails') or []
+            payload = {
+                'title': entry.get('title'),
+                'link': f"https://www.youtube.com/watch?v={entry['id']}",
+                'duration': to_iso_duration(str(int(entry.get('duration') or 0))),
+                'thumbnail': thumbs[0].get('url') if thumbs else None
+            }
         else:
-            with yt_dlp.YoutubeDL(ydl_opts_meta) as ydl:
-                info = ydl.extract_info(u, download=False)
-            return jsonify({
-                'title': info.get('title'),
-                'link': info.get('webpage_url'),
-                'duration': to_iso_duration(str(info.get('duration'))),
-                'thumbnail': info.get('thumbnail')
-            })
+            payload = None
+            if (vid_m := VID_RE.search(u)) is not None:
+                try:
+                    payload = await _run(_oembed_meta, vid_m.group(1))
+                except requests.RequestException:
+                    payload = None  # fall through to the extractor
+            if payload is None:
+                info, err, code = await extract_info(u, opts=ydl_opts_meta)
+                if err:
+                    return _j(err, code)
+                payload = {
+                    'title': info.get('title'),
+                    'link': info.get('webpage_url'),
+                    'duration': to_iso_duration(str(info.get('duration'))),
+                    'thumbnail': info.get('thumbnail')
+                }
+        await _run(cache_set, key, payload)
+        return _j(payload, max_age=3600)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _j({'error': str(e)}, 500)
 
 @app.route('/api/all')
-def api_all():
-    q = request.args.get('search', '').strip()
-    u = request.args.get('url', '').strip()
-    if not (q or u):
-        return jsonify({'error': 'Provide "search" or "url"'}), 400
-    info, err, code = extract_info(u or None, q or None)
+@require_search_or_url
+async def api_all(q, u):
+    # description/tags/suggestions can be tens of KB that most clients
+    # never read; they're returned only when the caller opts in
+    verbose = request.args.get('verbose') == '1'
+    key = f"all:{'verbose:' if verbose else ''}{q.lower() if q else u}"
+    if (cached := await _run(cache_get, key)) is not None:
+        return _j(cached)
+    # Fire the extraction and the suggestion search concurrently so the
+    # wall time is max(t_extract, t_search) rather than their sum
+    (info, err, code), extra = await asyncio.gather(
+        extract_info(u or None, q or None),
+        _run(_search_suggestions, q) if q and verbose
+        else asyncio.sleep(0, result=[]))
     if err:
-        return jsonify(err), code
+        return _j(err, code)
     fmts = build_formats_list(info)
-    suggestions = [{
-        'id': rel.get('id'),
-        'title': rel.get('title'),
-        'url': rel.get('webpage_url') or rel.get('url'),
-        'thumbnail': rel.get('thumbnails', [{}])[0].get('url')
-    } for rel in info.get('related', [])]
-    return jsonify({
+    payload = {
         'title': info.get('title'),
         'video_url': info.get('webpage_url'),
         'duration': info.get('duration'),
@@ -208,8 +632,6 @@ def api_all():
         'view_count': info.get('view_count'),
         'like_count': info.get('like_count'),
         'thumbnail': info.get('thumbnail'),
-        'description': info.get('description'),
-        'tags': info.get('tags'),
         'is_live': info.get('is_live'),
         'age_limit': info.get('age_limit'),
         'average_rating': info.get('average_rating'),
@@ -218,35 +640,53 @@ def api_all():
             'url': info.get('uploader_url') or info.get('channel_url'),
             'id': info.get('uploader_id')
         },
-        'formats': fmts,
-        'suggestions': suggestions
-    })
+        'formats': fmts
+    }
+    if verbose:
+        suggestions = [{
+            'id': rel.get('id'),
+            'title': rel.get('title'),
+            'url': rel.get('webpage_url') or rel.get('url'),
+            'thumbnail': rel.get('thumbnails', [{}])[0].get('url')
+        } for rel in info.get('related', [])]
+        suggestions += [s for s in extra if s['id'] != info.get('id')]
+        payload['description'] = info.get('description')
+        payload['tags'] = info.get('tags')
+        payload['suggestions'] = suggestions
+    await _run(cache_set, key, payload)
+    return _j(payload)
 
 @app.route('/api/meta')
-def api_meta():
-    q = request.args.get('search', '').strip()
-    u = request.args.get('url', '').strip()
-    if not (q or u):
-        return jsonify({'error': 'Provide "search" or "url"'}), 400
-    info, err, code = extract_info(u or None, q or None, opts=ydl_opts_meta)
+@require_search_or_url
+async def api_meta(q, u):
+    key = f"meta:{q.lower() if q else u}"
+    if (cached := await _run(cache_get, key)) is not None:
+        return _j(cached, max_age=3600)
+    info, err, code = await extract_info(u or None, q or None, opts=ydl_opts_meta)
     if err:
-        return jsonify(err), code
+        return _j(err, code)
     keys = ['id','title','webpage_url','duration','upload_date',
             'view_count','like_count','thumbnail','description',
             'tags','is_live','age_limit','average_rating',
             'uploader','uploader_url','uploader_id']
-    return jsonify({'metadata': {k: info.get(k) for k in keys}})
+    payload = {'metadata': {k: info.get(k) for k in keys}}
+    await _run(cache_set, key, payload)
+    return _j(payload, max_age=3600)
 
 @app.route('/api/channel')
-def api_channel():
+async def api_channel():
     cid = request.args.get('id', '').strip()
     cu = request.args.get('url', '').strip()
     if not (cid or cu):
-        return jsonify({'error': 'Provide "id" or "url"'}), 400
+        return _j({'error': 'Provide "id" or "url"'}, 400)
+    key = f"channel:{cid or cu}"
+    if (cached := await _run(cache_get, key)) is not None:
+        return _j(cached, max_age=86400)
     try:
-        with yt_dlp.YoutubeDL(ydl_opts_meta) as ydl:
-            info = ydl.extract_info(cid or cu, download=False)
-        return jsonify({
+        info, err, code = await extract_info(cid or cu, opts=ydl_opts_meta)
+        if err:
+            return _j(err, code)
+        payload = {
             'id': info.get('id'),
             'name': info.get('uploader'),
             'url': info.get('webpage_url'),
@@ -254,134 +694,200 @@ def api_channel():
             'subscriber_count': info.get('subscriber_count'),
             'video_count': info.get('channel_follower_count') or info.get('video_count'),
             'thumbnails': info.get('thumbnails'),
-        })
+        }
+        await _run(cache_set, key, payload)
+        return _j(payload, max_age=86400)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _j({'error': str(e)}, 500)
 
 @app.route('/api/playlist')
-def api_playlist():
+async def api_playlist():
     pid = request.args.get('id', '').strip()
     pu = request.args.get('url', '').strip()
     if not (pid or pu):
-        return jsonify({'error': 'Provide "id" or "url"'}), 400
+        return _j({'error': 'Provide "id" or "url"'}, 400)
+    key = f"playlist:{pid or pu}"
+    if (cached := await _run(cache_get, key)) is not None:
+        return _j(cached, max_age=86400)
     try:
-        with yt_dlp.YoutubeDL(ydl_opts_full) as ydl:
-            info = ydl.extract_info(pid or pu, download=False)
+        info = await single_flight(
+            f"extract:playlist:{pid or pu}",
+            lambda: _run(_extract_playlist_sync, pid or pu))
         videos = [{
             'id': e.get('id'),
             'title': e.get('title'),
-            'url': e.get('webpage_url'),
+            'url': e.get('webpage_url') or e.get('url')
+                   or f"https://www.youtube.com/watch?v={e.get('id')}",
             'duration': e.get('duration')
         } for e in info.get('entries', [])]
-        return jsonify({
+        payload = {
             'id': info.get('id'),
             'title': info.get('title'),
             'url': info.get('webpage_url'),
             'item_count': info.get('playlist_count'),
             'videos': videos
-        })
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/api/instagram')
-def api_instagram():
-    u = request.args.get('url', '').strip()
-    if not u:
-        return jsonify({'error': 'Provide "url"'}), 400
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts_meta) as ydl:
-            info = ydl.extract_info(u, download=False)
-        return jsonify(info)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/api/twitter')
-def api_twitter():
-    u = request.args.get('url', '').strip()
-    if not u:
-        return jsonify({'error': 'Provide "url"'}), 400
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts_meta) as ydl:
-            info = ydl.extract_info(u, download=False)
-        return jsonify(info)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/api/tiktok')
-def api_tiktok():
-    u = request.args.get('url', '').strip()
-    if not u:
-        return jsonify({'error': 'Provide "url"'}), 400
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts_meta) as ydl:
-            info = ydl.extract_info(u, download=False)
-        return jsonify(info)
+        }
+        await _run(cache_set, key, payload)
+        return _j(payload, max_age=86400)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/api/facebook')
-def api_facebook():
-    u = request.args.get('url', '').strip()
-    if not u:
-        return jsonify({'error': 'Provide "url"'}), 400
+        return _j({'error': str(e)}, 500)
+
+@app.route('/api/batch')
+async def api_batch():
+    # Extract several ids concurrently; wall time is the slowest single
+    # extraction rather than the sum, bounded by the executor pool
+    ids = [i for i in (x.strip() for x in
+                       request.args.get('ids', '').split(',')) if i]
+    if not ids:
+        return _j({'error': 'Provide "ids" as a comma-separated list'}, 400)
+    if len(ids) > 10:
+        return _j({'error': 'At most 10 ids per batch'}, 400)
+    results = await asyncio.gather(
+        *[extract_info(f"https://www.youtube.com/watch?v={vid}",
+                       opts=ydl_opts_meta) for vid in ids],
+        return_exceptions=True)
+    out = []
+    for vid, res in zip(ids, results):
+        if isinstance(res, BaseException):
+            out.append({'id': vid, 'error': str(res)})
+            continue
+        info, err, _code = res
+        if err:
+            out.append({'id': vid, **err})
+        else:
+            out.append({
+                'id': vid,
+                'title': info.get('title'),
+                'url': info.get('webpage_url'),
+                'duration': info.get('duration'),
+                'thumbnail': info.get('thumbnail')
+            })
+    return _j({'results': out})
+
+# Cached raw-metadata extraction shared by every endpoint that returns
+# an unshaped info dict; fresh=True bypasses every cache layer down to
+# the extractor, then repopulates them
+async def _simple_meta(prefix, url, fresh=False):
+    key = f"{prefix}:{url}"
+    if not fresh and (cached := await _run(cache_get, key)) is not None:
+        return _j(cached)
     try:
-        with yt_dlp.YoutubeDL(ydl_opts_meta) as ydl:
-            info = ydl.extract_info(u, download=False)
-        return jsonify(info)
+        info, err, code = await extract_info(url, opts=ydl_opts_meta,
+                                             fresh=fresh)
+        if err:
+            return _j(err, code)
+        await _run(cache_set, key, info)
+        return _j(info)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _j({'error': str(e)}, 500)
+
+# The social-media handlers are identical except for the cache-key
+# prefix, so they're stamped out of one factory - every optimization
+# (instance reuse, pool, cache) applies to all of them uniformly.
+# Passing ?latest=1 bypasses the cache for a fresh extraction.
+def _make_extract_route(prefix):
+    async def handler():
+        u = request.args.get('url', '').strip()
+        if not u:
+            return _j({'error': 'Provide "url"'}, 400)
+        return await _simple_meta(prefix, u, fresh='latest' in request.args)
+    handler.__name__ = f"api_{prefix}"
+    return handler
+
+for _prefix in ('instagram', 'twitter', 'tiktok', 'facebook'):
+    app.route(f'/api/{_prefix}')(_make_extract_route(_prefix))
 
 # -------------------------
 # Stream Endpoints
 # -------------------------
 STREAM_TIMEOUT = 5 * 3600
 
+# The proxy exists to relay YouTube CDN URLs; anything else would make
+# it an open proxy (internal addresses, cloud metadata, free bandwidth)
+_PROXY_HOST_SUFFIXES = ('.googlevideo.com', '.ytimg.com')
+
+def _proxy_host_ok(url):
+    parts = urlsplit(url)
+    return (parts.scheme in ('http', 'https')
+            and (parts.hostname or '').endswith(_PROXY_HOST_SUFFIXES))
+
+@app.route('/proxy')
+async def proxy():
+    # Forward the client's Range header to the upstream CDN and stream
+    # the slice back, so parallel downloaders (aria2, yt-dlp -N) can
+    # fetch multiple parts concurrently per RFC 7233
+    upstream = request.args.get('url', '').strip()
+    if not upstream:
+        return _j({'error': 'Provide "url"'}, 400)
+    if not _proxy_host_ok(upstream):
+        return _j({'error': 'Only YouTube CDN URLs can be proxied'}, 403)
+    hdrs = {'Range': request.headers.get('Range', 'bytes=0-'),
+            'User-Agent': request.headers.get('User-Agent', 'yt-dlp')}
+    try:
+        r = await asyncio.to_thread(
+            lambda: session.get(upstream, headers=hdrs, stream=True,
+                                timeout=30))
+    except requests.RequestException as e:
+        return _j({'error': str(e)}, 502)
+    passthrough = {k: r.headers[k] for k in
+                   ('Content-Range', 'Content-Length', 'Accept-Ranges',
+                    'Content-Type') if k in r.headers}
+
+    async def body():
+        it = r.iter_content(64 * 1024)
+        try:
+            while (chunk := await asyncio.to_thread(next, it, None)) is not None:
+                yield chunk
+        finally:
+            r.close()
+
+    return body(), r.status_code, passthrough
+
 @app.route('/download')
-def download():
-    url = request.args.get('url')
-    search = request.args.get('search')
-    if not (url or search):
-        return jsonify({'error': 'Provide "url" or "search"'}), 400
-    info, err, code = extract_info(url, search)
+@require_search_or_url
+async def download(q, u):
+    info, err, code = await extract_info(u or None, q or None)
     if err:
-        return jsonify(err), code
-    return jsonify({'formats': build_formats_list(info)})
+        return _j(err, code)
+    fmts = build_formats_list(info)
+    # nlargest is O(N log 3) and avoids materializing a sorted copy
+    return _j({
+        'formats': fmts,
+        'top_formats': heapq.nlargest(3, fmts, key=_res_key)
+    })
 
 @app.route('/api/audio')
-def api_audio():
-    url = request.args.get('url')
-    search = request.args.get('search')
-    if not (url or search):
-        return jsonify({'error': 'Provide "url" or "search"'}), 400
-    info, err, code = extract_info(url, search)
+@require_search_or_url
+async def api_audio(q, u):
+    info, err, code = await extract_info(u or None, q or None)
     if err:
-        return jsonify(err), code
-    afmts = [f for f in build_formats_list(info) if f['kind'] in ('audio-only','progressive')]
-    return jsonify({'audio_formats': afmts})
+        return _j(err, code)
+    _, prog, _, aonly = build_format_buckets(info)
+    return _j({'audio_formats': aonly + prog})
 
 @app.route('/api/video')
-def api_video():
-    url = request.args.get('url')
-    search = request.args.get('search')
-    if not (url or search):
-        return jsonify({'error': 'Provide "url" or "search"'}), 400
-    info, err, code = extract_info(url, search)
+@require_search_or_url
+async def api_video(q, u):
+    info, err, code = await extract_info(u or None, q or None)
     if err:
-        return jsonify(err), code
-    vfmts = [f for f in build_formats_list(info) if f['kind'] in ('video-only','progressive')]
-    return jsonify({'video_formats': vfmts})
+        return _j(err, code)
+    _, prog, vonly, _ = build_format_buckets(info)
+    return _j({'video_formats': vonly + prog})
 
 
 @app.route('/api/down')
-def api_download_audio():
+async def api_download_audio():
     url = request.args.get('url', '').strip()
     if not url:
-        return jsonify({'error': 'Provide "url" parameter'}), 400
+        return _j({'error': 'Provide "url" parameter'}, 400)
 
     try:
         # Download the worst-quality audio (with cookies) into /tmp
-        with yt_dlp.YoutubeDL(ydl_opts_download) as ydl:
-            info = ydl.extract_info(url, download=True)
+        def _download():
+            with yt_dlp.YoutubeDL(ydl_opts_download) as ydl:
+                ydl.cookiejar = jar
+                return ydl.extract_info(url, download=True)
+        info = await _run(_download)
 
         # Construct the filename from the video ID and extension
         filename = f"{info['id']}.{info.get('ext', 'm4a')}"
@@ -389,20 +895,24 @@ def api_download_audio():
 
         # Verify download
         if not os.path.isfile(filepath):
-            return jsonify({'error': 'Download failed'}), 500
-
-        # Stream back as a file attachment
-        return send_file(
-            filepath,
+            return _j({'error': 'Download failed'}, 500)
+
+        # Stream back as a file attachment; conditional=True honors
+        # Range/If-Modified-Since so interrupted downloads can resume
+        # instead of re-transferring the whole file. send_from_directory
+        # also pins the path inside /tmp and lets the server use the
+        # platform file wrapper (sendfile) where available.
+        return await send_from_directory(
+            '/tmp',
+            filename,
             as_attachment=True,
-            download_name=os.path.basename(filepath)
+            attachment_filename=filename,
+            conditional=True
         )
 
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return _j({'error': str(e)}, 500)
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
-
-
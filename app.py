@@ -1,66 +1,81 @@
 import os
+import re
+import functools
+import orjson
 import requests
 from http.cookiejar import MozillaCookieJar
-from flask import Flask, request, jsonify
+from flask import Flask, request
+import youtube_search
 from youtube_search import YoutubeSearch
 
 # ----- Load Cookies from a Netscape Cookie File and Patch requests.get -----
 cookie_file = 'cookies.txt'
+
+# Create a session with a real connection pool; the old wrapper still
+# delegated to requests.get, which builds a throwaway Session (and a
+# fresh TCP+TLS handshake) on every call
+session = requests.Session()
 if os.path.exists(cookie_file):
     cookie_jar = MozillaCookieJar(cookie_file)
     # Load cookies from the file; ignore discard and expiration for demo purposes
     cookie_jar.load(ignore_discard=True, ignore_expires=True)
-    
-    # Create a session and assign the loaded cookies
-    session = requests.Session()
     session.cookies = cookie_jar
 
-    # Preserve the original requests.get function
-    original_get = requests.get
-
-    def get_with_cookies(url, **kwargs):
-        # Ensure that cookies are passed with each GET request
-        kwargs.setdefault("cookies", session.cookies)
-        return original_get(url, **kwargs)
+adapter = requests.adapters.HTTPAdapter(
+    pool_connections=32, pool_maxsize=64, max_retries=3)
+session.mount('https://', adapter)
+session.mount('http://', adapter)
 
-    # Replace requests.get with our custom version
-    requests.get = get_with_cookies
+# Inject the pooled, cookied session into youtube_search only, rather
+# than monkey-patching requests.get for every consumer in the process
+youtube_search.requests = session  # Session.get matches requests.get
 
 app = Flask(__name__)
 
+def ojsonify(obj, status=200):
+    # orjson is several times faster than the pure-Python encoder
+    # behind flask.jsonify for these payloads
+    return app.response_class(orjson.dumps(obj, default=str), status=status,
+                              mimetype='application/json')
+
+# Serialized once at import; the body never changes
+_HOME_BODY = orjson.dumps({"message": "✅ YouTube Search API is alive!"})
+
 @app.route('/')
 def home():
-    return jsonify({"message": "✅ YouTube Search API is alive!"})
+    return app.response_class(_HOME_BODY, mimetype='application/json')
 
 # Helper to convert "MM:SS" or "HH:MM:SS" to ISO 8601 duration (PT...)
+_DUR_RE = re.compile(r'^(?:(\d+):)?(?:(\d+):)?(\d+)$')
+
+@functools.lru_cache(maxsize=4096)
 def to_iso_duration(duration_str: str) -> str:
-    parts = duration_str.split(':') if duration_str else []
-    iso = 'PT'
-    if len(parts) == 3:
-        h, m, s = parts
-        if int(h):
-            iso += f"{int(h)}H"
-        iso += f"{int(m)}M{int(s)}S"
-    elif len(parts) == 2:
-        m, s = parts
-        iso += f"{int(m)}M{int(s)}S"
-    elif len(parts) == 1 and parts[0].isdigit():
-        iso += f"{int(parts[0])}S"
-    else:
+    if not duration_str:
+        return 'PT0S'
+    m = _DUR_RE.match(duration_str)
+    if not m:
         # Fallback if format unexpected
-        iso += '0S'
-    return iso
+        return 'PT0S'
+    # Left-pad so "MM:SS" fills minutes/seconds rather than hours
+    parts = [int(x) for x in m.groups() if x is not None]
+    h, mi, s = [0] * (3 - len(parts)) + parts
+    iso = 'PT'
+    if h:
+        iso += f"{h}H"
+    if mi or h:
+        iso += f"{mi}M"
+    return iso + f"{s}S"
 
 @app.route('/search', methods=['GET'])
 def search():
     title = request.args.get('title', '').strip()
     if not title:
-        return jsonify({"error": "Missing 'title' query parameter."}), 400
+        return ojsonify({"error": "Missing 'title' query parameter."}, 400)
 
     try:
         results = YoutubeSearch(title, max_results=10).to_dict()
         if not results:
-            return jsonify({"error": "No results found."}), 404
+            return ojsonify({"error": "No results found."}, 404)
 
         first_video = results[0]
         iso_duration = to_iso_duration(first_video.get('duration', ''))
@@ -72,9 +87,9 @@ def search():
             "thumbnail": first_video.get("thumbnails", [None])[0]
         }
 
-        return jsonify(video_data)
+        return ojsonify(video_data)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return ojsonify({"error": str(e)}, 500)
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 5000))